@@ -0,0 +1,41 @@
+"""
+Shared configuration for the IPEDS / Form 990 scripts.
+
+Every setting is resolved in this order:
+  1. an environment variable (e.g. IPEDS990_BASE_PATH),
+  2. the ipeds990.ini file next to these scripts (or the file named by
+     IPEDS990_CONFIG), see ipeds990.example.ini,
+  3. the defaults below.
+
+This module only uses the standard library so importing it stays cheap.
+"""
+import configparser
+import os
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.environ.get("IPEDS990_CONFIG") or os.path.join(SCRIPT_DIR, "ipeds990.ini")
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+DEFAULT_ACCEPT = 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
+
+_parser = configparser.ConfigParser()
+_parser.read(CONFIG_FILE, encoding="utf-8")
+
+def get_setting(section, key, env_var, default):
+    """
+    Returns a setting from the environment, the config file, or `default`.
+    """
+    value = os.environ.get(env_var)
+    if value:
+        return value
+    return _parser.get(section, key, fallback=default)
+
+# Directory holding the input CSVs, the summary workbooks and the downloads.
+# Defaults to the folder these scripts live in.
+BASE_PATH = get_setting("paths", "base_path", "IPEDS990_BASE_PATH", SCRIPT_DIR)
+
+# Headers to mimic a browser
+HEADERS = {
+    'User-Agent': get_setting("http", "user_agent", "IPEDS990_USER_AGENT", DEFAULT_USER_AGENT),
+    'Accept': get_setting("http", "accept", "IPEDS990_ACCEPT", DEFAULT_ACCEPT)
+}
@@ -0,0 +1,174 @@
+import os
+import sys
+import pandas as pd
+import numpy as np
+
+from config import BASE_PATH
+import profiling
+
+# --- Configuration ---
+INPUT_FILE = "all_universities_summary.xlsx"
+OUTPUT_FILE = "derived_metrics.csv"
+
+KEY_COLUMNS = ["university_folder", "Year"]
+
+# Financial fields written by the extractor. All of them are cleaned and
+# carried into the table so it can stand in for the summary workbook.
+EXTRACTED_COLUMNS = [
+    "Total_Assets",
+    "Total_Liabilities",
+    "Total_Net_Assets",
+    "Cash_Non_Int",
+    "Savings_Temp_Cash",
+    "Pledges_Grants_Net",
+    "Accounts_Rec_Net",
+    "Prepaid_Deferred",
+    "Land_Bldg_Equip_Cost",
+    "Accum_Deprec",
+    "Public_Securities",
+    "Accounts_Payable",
+    "Deferred_Revenue",
+    "Tax_Exempt_Bonds",
+    "Unrestricted_Net_Assets",
+    "Temp_Restricted",
+    "Perm_Restricted",
+    "Total_Expenses",
+]
+
+# Fields that get a year-over-year growth rate (<field>_YoY)
+GROWTH_COLUMNS = ["Total_Assets", "Total_Net_Assets", "Total_Expenses"]
+
+def to_number(series):
+    """
+    Converts extracted amounts such as '7,388,525.21', '8,142,767.' or
+    '(1,200)' to floats. Values that cannot be parsed become NaN.
+
+    >>> to_number(pd.Series(['372.742.494', '<423,526.>', '<1,646.>', '385.913.30'])).tolist()
+    [372742494.0, -423526.0, -1646.0, 385913.3]
+    """
+    text = series.astype("string").str.strip()
+    # Forms print negatives in parentheses; OCR often reads them as '<...>'.
+    negative = text.str.match(r"^[(<].*[)>]$").fillna(False)
+    text = text.str.replace(r"[,\s$()<>]", "", regex=True)
+    # OCR sometimes uses '.' as a thousands separator. In '372.742.494' every
+    # dot groups digits; otherwise ('385.913.30') the last one is the decimal
+    # point.
+    grouped = text.str.match(r"^\d{1,3}(\.\d{3})+\.?$").fillna(False)
+    text = text.where(~grouped, text.str.replace(".", "", regex=False))
+    text = text.str.replace(r"\.(?=.*\.)", "", regex=True)
+    values = pd.to_numeric(text, errors="coerce")
+    return values.where(~negative, -values)
+
+def load_panel(input_path):
+    """
+    Reads the extraction summary and returns one numeric row per
+    institution folder and panel year (taken from the '<Year>_' filename
+    prefix, which matches the IPEDS Year the filing was downloaded for).
+    Rows where every extracted field is 0 are extractor failures, not real
+    filings, so their fields are set to NaN: they stay in the panel as
+    missing years and are left out of ratios, growth rates and medians. A
+    Total_Assets of 0 on an otherwise partial row is treated the same way
+    for that field.
+    """
+    with profiling.timer("metrics.read_excel"):
+        df = pd.read_excel(input_path)
+    df = df[df["university_folder"].notna() & df["error"].isna()].copy()
+
+    df["Year"] = pd.to_numeric(df["filename"].str.extract(r"^(\d{4})_")[0], errors="coerce")
+    df = df[df["Year"].notna()]
+    df["Year"] = df["Year"].astype(int)
+
+    for col in EXTRACTED_COLUMNS:
+        df[col] = to_number(df[col])
+    failed = df[EXTRACTED_COLUMNS].eq(0).all(axis=1)
+    df.loc[failed, EXTRACTED_COLUMNS] = np.nan
+    df.loc[df["Total_Assets"] == 0, "Total_Assets"] = np.nan
+
+    df = df.drop_duplicates(KEY_COLUMNS, keep="last")
+    return df[KEY_COLUMNS + EXTRACTED_COLUMNS].reset_index(drop=True)
+
+def _ratio(numerator, denominator):
+    return (numerator / denominator.where(denominator != 0)).replace([np.inf, -np.inf], np.nan)
+
+@profiling.timed("metrics.compute_metrics")
+def compute_metrics(panel):
+    """
+    Computes the derived metrics for every row of `panel`. Growth rates are
+    taken within each institution against the previous panel year and are
+    left empty when that year is missing.
+    """
+    df = panel.sort_values(KEY_COLUMNS).reset_index(drop=True)
+
+    df["Leverage"] = _ratio(df["Total_Liabilities"], df["Total_Assets"])
+    df["Unrestricted_Share"] = _ratio(df["Unrestricted_Net_Assets"], df["Total_Net_Assets"])
+    df["Temp_Restricted_Share"] = _ratio(df["Temp_Restricted"], df["Total_Net_Assets"])
+    df["Perm_Restricted_Share"] = _ratio(df["Perm_Restricted"], df["Total_Net_Assets"])
+    df["Expense_Ratio"] = _ratio(df["Total_Expenses"], df["Total_Assets"])
+
+    grouped = df.groupby("university_folder", sort=False)
+    consecutive = grouped["Year"].shift(1) == df["Year"] - 1
+    previous = grouped[GROWTH_COLUMNS].shift(1)
+    for col in GROWTH_COLUMNS:
+        growth = (df[col] - previous[col]) / previous[col].abs()
+        df[f"{col}_YoY"] = growth.where(consecutive).replace([np.inf, -np.inf], np.nan)
+
+    return df
+
+def update_metrics(panel, existing):
+    """
+    Returns the derived-metrics table for `panel`, reusing rows from
+    `existing` (a previously saved table, or None). Only institutions with
+    new, changed or removed panel rows are recomputed. A table saved without
+    some of the current columns is rebuilt from scratch.
+    """
+    columns = KEY_COLUMNS + EXTRACTED_COLUMNS
+    if existing is None or existing.empty or not set(columns) <= set(existing.columns):
+        return compute_metrics(panel), panel["university_folder"].nunique()
+
+    stored = existing[columns]
+    diff = panel.merge(stored, on=columns, how="outer", indicator=True)
+    affected = set(diff.loc[diff["_merge"] != "both", "university_folder"])
+
+    kept = existing[~existing["university_folder"].isin(affected)]
+    recomputed = compute_metrics(panel[panel["university_folder"].isin(affected)])
+    result = pd.concat([kept, recomputed], ignore_index=True)
+    return result.sort_values(KEY_COLUMNS).reset_index(drop=True), len(affected)
+
+def load_metrics(path=None):
+    """
+    Loads the saved derived-metrics table.
+    """
+    return pd.read_csv(path or os.path.join(BASE_PATH, OUTPUT_FILE))
+
+def main(full_rebuild=False):
+    print("---------------------------------------------------------")
+    print("Updating Derived Metrics Panel")
+
+    input_path = os.path.join(BASE_PATH, INPUT_FILE)
+    output_path = os.path.join(BASE_PATH, OUTPUT_FILE)
+
+    if not os.path.exists(input_path):
+        print(f"Error: {input_path} not found.")
+        return 1
+
+    print(f"Reading {INPUT_FILE}...")
+    panel = load_panel(input_path)
+    print(f"Found {len(panel)} extracted rows for {panel['university_folder'].nunique()} institutions.")
+
+    existing = None
+    if not full_rebuild and os.path.exists(output_path):
+        existing = load_metrics(output_path)
+
+    metrics, recomputed = update_metrics(panel, existing)
+    with profiling.timer("metrics.write_csv"):
+        metrics.to_csv(output_path, index=False)
+
+    print(f"Recomputed {recomputed} institutions.")
+    print(f"Done! Derived metrics saved to: {OUTPUT_FILE}")
+    print(f"Full path: {output_path}")
+    print("---------------------------------------------------------")
+
+if __name__ == "__main__":
+    with profiling.stage("metrics"):
+        status = main()
+    sys.exit(status)
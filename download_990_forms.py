@@ -2,6 +2,8 @@ import requests
 import os
 import time
 
+from config import HEADERS
+
 # --- Configuration ---
 # 1. Edit this list with the EINs you want to process.
 #    EINs should be strings (e.g., "042103580").
@@ -22,12 +24,6 @@ DOWNLOAD_DIR = "downloaded_990s"
 # ProPublica API Base URL
 API_BASE_URL = "https://projects.propublica.org/nonprofits/api/v2/organizations"
 
-# Headers to mimic a browser/legitimate client
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-}
-
 def get_filings(ein):
     """
     Queries the ProPublica Nonprofits API for an organization's filings.
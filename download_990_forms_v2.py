@@ -1,22 +1,113 @@
 import csv
+import hashlib
+import json
 import requests
 import os
+import sys
+import shutil
+import threading
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from config import BASE_PATH, HEADERS
+import profiling
 
 # --- Configuration ---
 INPUT_FILE = "unique_eins_with_pdf_links_v2.csv"
-BASE_PATH = r"c:\Users\terre\Documents\Victor Dissertation Project - Gemini\pdf download 990"
 DOWNLOAD_DIR = "downloaded_990s_v2"
+# Shared store (inside DOWNLOAD_DIR) holding one copy of each unique URL;
+# institution folders contain hardlinks into it.
+BLOB_DIR = "_blobs"
+
+# Scheduling settings for main (see schedule_jobs for the priority keys)
+PRIORITY_KEYS = ("missing-first", "round-robin", "smallest-first", "csv")
+DEFAULT_PRIORITY = "csv"
+SUMMARY_FILE = "derived_metrics.csv"
+SIZES_FILE = "_sizes.json"
+DEFAULT_WORKERS = 1
+PER_HOST_LIMIT = 2
+MIN_FREE_BYTES = 1024 ** 3
+POLITE_DELAY = 0.5
+
+# Streaming validation settings for download_file
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+PDF_MAGIC = b"%PDF-"
+PDF_EOF = b"%%EOF"
+PDF_HEADER_WINDOW = 1024
+PDF_TRAILER_WINDOW = 1024
+
+def _pick_chunk_size(content_length):
+    """
+    Chooses a read size proportional to the expected file size so large
+    scanned filings are written in fewer, bigger chunks.
+    """
+    if not content_length:
+        return MIN_CHUNK_SIZE
+    return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, content_length // 16))
 
-# Headers to mimic a browser
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-}
+def blob_name_for_url(url):
+    """
+    Returns the blob store filename for a URL. Identical URLs always map to
+    the same blob, whichever institution row they came from.
+    """
+    return hashlib.sha1(url.encode("utf-8")).hexdigest() + ".pdf"
 
+def link_into_place(source_path, target_path):
+    """
+    Materialises `source_path` at `target_path`, preferring a hardlink, then
+    a symlink, and finally a plain copy if the filesystem supports neither.
+    """
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    if os.path.lexists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(source_path), target_path)
+        except OSError:
+            shutil.copyfile(source_path, target_path)
+
+def write_checksum(filepath, hexdigest):
+    """
+    Writes a sha256sum-compatible `<filepath>.sha256` sidecar.
+    """
+    with open(filepath + ".sha256", 'w', encoding='utf-8') as f:
+        f.write(f"{hexdigest}  {os.path.basename(filepath)}\n")
+
+def verify_pdf(filepath):
+    """
+    Applies download_file's checks to a file already on disk: %PDF header
+    near the start and %%EOF near the end. Returns the SHA-256 hex digest,
+    or None if the file is not a complete PDF.
+    """
+    digest = hashlib.sha256()
+    head = b""
+    tail = b""
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(MAX_CHUNK_SIZE), b""):
+            if len(head) < PDF_HEADER_WINDOW:
+                head += chunk[:PDF_HEADER_WINDOW - len(head)]
+            tail = (tail + chunk)[-PDF_TRAILER_WINDOW:]
+            digest.update(chunk)
+    if PDF_MAGIC not in head or PDF_EOF not in tail:
+        return None
+    return digest.hexdigest()
+
+@profiling.timed("download_file")
 def download_file(url, folder, filename):
     """
     Downloads a file from a URL and saves it to a specified folder.
+
+    The response is validated while it streams: the body must start with the
+    %PDF header, match the advertised Content-Length and end with an %%EOF
+    marker. A SHA-256 digest is computed over the same chunks and written to
+    a `<filename>.sha256` sidecar, so no second read of the file is needed.
+    Data is written to a `.part` file and only renamed into place once every
+    check passes.
     """
     if not url:
         return False
@@ -31,29 +122,232 @@ def download_file(url, folder, filename):
         if os.path.getsize(filepath) > 0:
             return "exists"
 
+    part_path = filepath + ".part"
     try:
         response = requests.get(url, headers=HEADERS, stream=True, timeout=30)
         response.raise_for_status()
-        
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+
+        # Content-Length only describes the body we receive when the server
+        # did not compress it (requests transparently decodes gzip/deflate).
+        expected_length = None
+        if response.headers.get("Content-Encoding", "identity") == "identity":
+            try:
+                expected_length = int(response.headers.get("Content-Length", ""))
+            except ValueError:
+                expected_length = None
+
+        digest = hashlib.sha256()
+        head = b""
+        tail = b""
+        received = 0
+
+        with open(part_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=_pick_chunk_size(expected_length)):
+                if not chunk:
+                    continue
+                # The PDF header may legally be preceded by a little junk, so
+                # look for it anywhere in the first PDF_HEADER_WINDOW bytes.
+                if len(head) < PDF_HEADER_WINDOW:
+                    head += chunk[:PDF_HEADER_WINDOW - len(head)]
+                    if len(head) >= PDF_HEADER_WINDOW and PDF_MAGIC not in head:
+                        raise ValueError("response is not a PDF (missing %PDF header)")
+                tail = (tail + chunk)[-PDF_TRAILER_WINDOW:]
+                digest.update(chunk)
+                received += len(chunk)
+                f.write(chunk)
+
+        if PDF_MAGIC not in head:
+            raise ValueError("response is not a PDF (missing %PDF header)")
+        if expected_length is not None and received != expected_length:
+            raise ValueError(f"truncated transfer ({received} of {expected_length} bytes)")
+        if PDF_EOF not in tail:
+            raise ValueError("PDF is incomplete (missing %%EOF marker)")
+
+        os.replace(part_path, filepath)
+        write_checksum(filepath, digest.hexdigest())
         return True
     except Exception as e:
         print(f"\n      Error downloading {url}: {e}")
+        if os.path.exists(part_path):
+            os.remove(part_path)
         return False
 
-def main():
+def load_summary_coverage(path):
+    """
+    Returns the set of (institution folder, year) pairs that already have
+    extracted financials in the derived-metrics table.
+    """
+    covered = set()
+    if not os.path.exists(path):
+        return covered
+    with open(path, mode='r', newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            # Failed extractions are stored as empty or 0, which is not
+            # coverage.
+            try:
+                total_assets = float(row.get("Total_Assets") or "")
+            except ValueError:
+                continue
+            if total_assets != 0:
+                covered.add((row.get("university_folder"), row.get("Year")))
+    return covered
+
+def probe_sizes(urls, cache_path, deadline=None):
+    """
+    Looks up the Content-Length of each URL with a HEAD request. Results are
+    cached in `cache_path` so later runs only probe new URLs. Probing stops
+    at `deadline` (a time.monotonic() value); unprobed URLs sort last.
+    """
+    sizes = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            sizes = json.load(f)
+
+    to_probe = [url for url in urls if url not in sizes]
+    for i, url in enumerate(to_probe, 1):
+        if deadline is not None and time.monotonic() >= deadline:
+            print("\nTime limit reached while probing file sizes.", end="")
+            break
+        print(f"\rProbing file sizes [{i}/{len(to_probe)}]", end="", flush=True)
+        try:
+            response = requests.head(url, headers=HEADERS, allow_redirects=True, timeout=10)
+            response.raise_for_status()
+            sizes[url] = int(response.headers.get("Content-Length", ""))
+        except (requests.exceptions.RequestException, ValueError):
+            continue
+        time.sleep(0.1)
+    if to_probe:
+        print()
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(sizes, f)
+    return sizes
+
+def parse_priority(priority):
+    """
+    Splits a comma-separated priority string and checks every key is known.
+    """
+    keys = [k.strip() for k in priority.split(",") if k.strip()]
+    unknown = [k for k in keys if k not in PRIORITY_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown priority key(s): {', '.join(unknown)}")
+    return keys
+
+def schedule_jobs(jobs, priority, covered=None, sizes=None):
+    """
+    Orders download jobs by a comma-separated list of priority keys, applied
+    left to right (later keys break ties of earlier ones):
+
+      missing-first   filings for institution/years without summary data
+      round-robin     interleave institutions instead of finishing each in turn
+      smallest-first  smallest Content-Length first (unknown sizes last)
+      csv             input file order (always the final tie-breaker)
+    """
+    keys = parse_priority(priority)
+    covered = covered or set()
+    sizes = sizes or {}
+    sort_keys = {id(job): [] for job in jobs}
+
+    for key in keys:
+        if key == "missing-first":
+            for job in jobs:
+                has_data = all((t["institution"], t["year"]) in covered for t in job["targets"])
+                sort_keys[id(job)].append(1 if has_data else 0)
+        elif key == "round-robin":
+            # Number each institution's jobs in the order the earlier keys
+            # put them, so sorting by that number interleaves institutions.
+            seen = {}
+            for job in sorted(jobs, key=lambda j: (sort_keys[id(j)], j["index"])):
+                rank = seen.get(job["institution"], 0)
+                seen[job["institution"]] = rank + 1
+                sort_keys[id(job)].append(rank)
+        elif key == "smallest-first":
+            for job in jobs:
+                sort_keys[id(job)].append(sizes.get(job["url"], float("inf")))
+
+    return sorted(jobs, key=lambda j: (sort_keys[id(j)], j["index"]))
+
+class HostLimiter:
+    """
+    Caps the number of simultaneous downloads from any one host.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.limit)
+            return self._slots[host]
+
+def process_job(job, blob_dir, limiter):
+    """
+    Makes sure the blob for `job` exists (adopting an earlier per-institution
+    copy or downloading it) and links it into every missing target.
+    Returns (result, bytes downloaded, links created) where result is as for
+    download_file.
+    """
+    url = job["url"]
+    blob_name = blob_name_for_url(url)
+    blob_path = os.path.join(blob_dir, blob_name)
+    missing = list(job["missing"])
+
+    result = "exists" if os.path.exists(blob_path) else None
+    if result is None:
+        # A previous run may already have saved this filing for one
+        # institution. Files from before streaming validation can be HTML
+        # error pages or truncated, so only adopt a copy that passes the
+        # same checks; bad copies are replaced by a fresh download.
+        for target in job["targets"]:
+            if target["path"] in missing:
+                continue
+            hexdigest = verify_pdf(target["path"])
+            if hexdigest is None:
+                missing.append(target["path"])
+            elif result is None:
+                os.makedirs(blob_dir, exist_ok=True)
+                link_into_place(target["path"], blob_path)
+                write_checksum(blob_path, hexdigest)
+                result = "exists"
+
+    downloaded = 0
+    if result is None:
+        with limiter.slot(url):
+            result = download_file(url, blob_dir, blob_name)
+            if result == True:
+                downloaded = os.path.getsize(blob_path)
+                time.sleep(POLITE_DELAY)
+
+    if result:
+        for target_path in missing:
+            link_into_place(blob_path, target_path)
+    return result, downloaded, len(missing)
+
+def main(priority=DEFAULT_PRIORITY, max_bytes=None, max_minutes=None,
+         workers=DEFAULT_WORKERS, per_host=PER_HOST_LIMIT, min_free_bytes=MIN_FREE_BYTES):
     print("---------------------------------------------------------")
     print("Starting Bulk 990 PDF Downloader (v2)")
     
     input_path = os.path.join(BASE_PATH, INPUT_FILE)
     output_base_dir = os.path.join(BASE_PATH, DOWNLOAD_DIR)
 
+    try:
+        priority_keys = parse_priority(priority)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    if workers < 1 or per_host < 1:
+        print("Error: workers and per_host must be at least 1.")
+        return 1
+
+    # The time limit covers the whole run, including size probing.
+    deadline = time.monotonic() + max_minutes * 60 if max_minutes is not None else None
+
     if not os.path.exists(input_path):
         print(f"Error: {input_path} not found.")
-        return
+        return 1
 
     if not os.path.exists(output_base_dir):
         os.makedirs(output_base_dir, exist_ok=True)
@@ -67,23 +361,20 @@ def main():
             if row.get("990_PDF_URL") and row["990_PDF_URL"].strip():
                 rows_to_process.append(row)
 
-    total = len(rows_to_process)
-    print(f"Found {total} rows with PDF links. Starting downloads...")
-    print("---------------------------------------------------------")
-
-    success_count = 0
-    skipped_count = 0
-    error_count = 0
-
-    for i, row in enumerate(rows_to_process, 1):
+    # Several institutions can share a Corrected_EIN (and therefore the same
+    # ProPublica URL). Group rows by URL so each filing is fetched only once.
+    # Structure: url_targets[url] = [{"path", "label", "institution", "year"}, ...]
+    url_targets = {}
+    for row in rows_to_process:
         ein = row.get("Corrected_EIN") or row.get("EIN")
         year = row.get("Year")
         inst_name = row.get("Institution Name", "Unknown").replace(" ", "_").replace("/", "_")[:30]
-        url = row["990_PDF_URL"]
+        url = row["990_PDF_URL"].strip()
         
         # Sanitize folder name
         safe_name = "".join([c for c in inst_name if c.isalnum() or c == '_'])
-        folder = os.path.join(output_base_dir, f"{ein}_{safe_name}")
+        folder_name = f"{ein}_{safe_name}"
+        folder = os.path.join(output_base_dir, folder_name)
         
         # Determine filename
         # ProPublica URLs usually end in .pdf or have a unique ID
@@ -92,29 +383,134 @@ def main():
             file_id += ".pdf"
         filename = f"{year}_{file_id}"
 
-        # Progress update
-        print(f"[{i}/{total}] {ein} ({year}) - {inst_name}...", end="", flush=True)
+        # The IPEDS lists repeat some institution/year rows; one file per
+        # path is enough.
+        path = os.path.join(folder, filename)
+        targets = url_targets.setdefault(url, [])
+        if any(t["path"] == path for t in targets):
+            continue
+        targets.append({
+            "path": path,
+            "label": f"{ein} ({year}) - {inst_name}",
+            "institution": folder_name,
+            "year": year,
+        })
 
-        result = download_file(url, folder, filename)
-        
-        if result == True:
-            print(" DONE")
-            success_count += 1
-            time.sleep(0.5) # Polite delay
-        elif result == "exists":
-            print(" SKIPPED (Exists)")
+    print(f"Found {len(rows_to_process)} rows with PDF links ({len(url_targets)} unique URLs).")
+
+    # Skip filings that every institution folder already has before doing
+    # any scheduling work.
+    jobs = []
+    skipped_count = 0
+    for index, (url, targets) in enumerate(url_targets.items()):
+        missing = [
+            t["path"] for t in targets
+            if not (os.path.exists(t["path"]) and os.path.getsize(t["path"]) > 0)
+        ]
+        if not missing:
             skipped_count += 1
-        else:
-            print(" FAILED")
-            error_count += 1
+            continue
+        jobs.append({
+            "index": index,
+            "url": url,
+            "targets": targets,
+            "missing": missing,
+            "institution": targets[0]["institution"],
+        })
+
+    covered = None
+    if "missing-first" in priority_keys:
+        covered = load_summary_coverage(os.path.join(BASE_PATH, SUMMARY_FILE))
+    sizes = None
+    if "smallest-first" in priority_keys:
+        sizes = probe_sizes([job["url"] for job in jobs], os.path.join(output_base_dir, SIZES_FILE), deadline)
+    jobs = schedule_jobs(jobs, priority, covered, sizes)
+
+    total = len(jobs)
+    print(f"{skipped_count} already downloaded, {total} to fetch (priority: {priority}).")
+    print("---------------------------------------------------------")
+
+    blob_dir = os.path.join(output_base_dir, BLOB_DIR)
+    limiter = HostLimiter(per_host)
+    success_count = 0
+    linked_count = 0
+    error_count = 0
+    over_budget_count = 0
+    downloaded_bytes = 0
+    # Known sizes of downloads still in flight, counted against max_bytes
+    reserved_bytes = 0
+    completed = 0
+    stop_reason = None
+
+    queue = deque(jobs)
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while queue or in_flight:
+            while queue and len(in_flight) < workers and stop_reason is None:
+                if deadline is not None and time.monotonic() >= deadline:
+                    stop_reason = f"time limit of {max_minutes} minutes reached"
+                elif max_bytes is not None and downloaded_bytes + reserved_bytes >= max_bytes:
+                    stop_reason = f"download budget of {max_bytes / 1024 ** 3:.2f} GB reached"
+                elif shutil.disk_usage(output_base_dir).free < min_free_bytes:
+                    stop_reason = f"free disk space below {min_free_bytes / 1024 ** 3:.2f} GB"
+                if stop_reason:
+                    break
+
+                job = queue.popleft()
+                known_size = (sizes or {}).get(job["url"])
+                if max_bytes is not None and known_size and downloaded_bytes + reserved_bytes + known_size > max_bytes:
+                    # Leave room for smaller filings that still fit the budget.
+                    over_budget_count += 1
+                    continue
+                reserved_bytes += known_size or 0
+                in_flight[pool.submit(process_job, job, blob_dir, limiter)] = job
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = in_flight.pop(future)
+                reserved_bytes -= (sizes or {}).get(job["url"]) or 0
+                completed += 1
+                label = job["targets"][0]["label"]
+                if len(job["targets"]) > 1:
+                    label += f" (+{len(job['targets']) - 1} more)"
+
+                try:
+                    result, nbytes, linked = future.result()
+                except Exception as e:
+                    print(f"\n      Error processing {job['url']}: {e}")
+                    result, nbytes, linked = False, 0, 0
+
+                if not result:
+                    print(f"[{completed}/{total}] {label}... FAILED")
+                    error_count += 1
+                    continue
+
+                linked_count += linked
+                if result == True:
+                    print(f"[{completed}/{total}] {label}... DONE")
+                    success_count += 1
+                    downloaded_bytes += nbytes
+                else:
+                    print(f"[{completed}/{total}] {label}... LINKED ({linked})")
+                    skipped_count += 1
 
     print("\n---------------------------------------------------------")
+    if stop_reason:
+        print(f"Stopped early: {stop_reason}.")
     print("Download Complete!")
-    print(f"Successfully Downloaded: {success_count}")
+    print(f"Successfully Downloaded: {success_count} ({downloaded_bytes / 1024 ** 2:.1f} MB)")
     print(f"Already Existed: {skipped_count}")
+    print(f"Institution Links Created: {linked_count}")
     print(f"Failed: {error_count}")
+    if over_budget_count or queue:
+        print(f"Not Attempted: {over_budget_count + len(queue)}")
     print(f"Files saved in: {output_base_dir}")
     print("---------------------------------------------------------")
 
 if __name__ == "__main__":
-    main()
+    with profiling.stage("download"):
+        status = main()
+    sys.exit(status)
@@ -4,18 +4,15 @@ import time
 import os
 import sys
 
+from config import BASE_PATH, HEADERS
+import profiling
+
 # --- Constants ---
 INPUT_FILE = "unique_eins_open_closed_v2_longitudinal_2000_2018.csv"
 OUTPUT_FILE = "unique_eins_corrected.csv"
-BASE_PATH = r"c:\Users\terre\Documents\Victor Dissertation Project - Gemini\pdf download 990"
 SEARCH_API_URL = "https://projects.propublica.org/nonprofits/api/v2/search.json"
 
-# Headers to mimic a browser
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-}
-
+@profiling.timed("search_ein_by_name")
 def search_ein_by_name(name):
     """
     Searches ProPublica for the organization name and returns the top EIN result.
@@ -27,7 +24,8 @@ def search_ein_by_name(name):
     try:
         response = requests.get(SEARCH_API_URL, headers=HEADERS, params=params, timeout=10)
         response.raise_for_status()
-        data = response.json()
+        with profiling.timer("search_ein_by_name.json_decode"):
+            data = response.json()
         
         organizations = data.get('organizations', [])
         if organizations:
@@ -56,7 +54,7 @@ def main():
 
     if not os.path.exists(input_path):
         print(f"Error: {input_path} not found.")
-        return
+        return 1
 
     print("Reading input CSV...")
     try:
@@ -73,7 +71,7 @@ def main():
                     
     except Exception as e:
         print(f"Error reading CSV: {e}")
-        return
+        return 1
 
     print(f"Found {len(unique_institutions)} unique institutions.")
 
@@ -131,7 +129,8 @@ def main():
                     row["Corrected_EIN"] = orig_ein
                     row["ProPublica_Name"] = ""
                 
-                writer.writerow(row)
+                with profiling.timer("resolve_eins.csv_writerow"):
+                    writer.writerow(row)
                 
         print("---------------------------------------------------------")
         print(f"Done! Corrected file saved to: {OUTPUT_FILE}")
@@ -139,6 +138,9 @@ def main():
 
     except Exception as e:
         print(f"Error writing output CSV: {e}")
+        return 1
 
 if __name__ == "__main__":
-    main()
+    with profiling.stage("resolve-eins"):
+        status = main()
+    sys.exit(status)
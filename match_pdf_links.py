@@ -4,18 +4,13 @@ import time
 import os
 import sys
 
+from config import BASE_PATH, HEADERS
+
 # --- Constants ---
 INPUT_FILE = "unique_eins_open_closed_v2_longitudinal_2000_2018.csv"
 OUTPUT_FILE = "unique_eins_with_pdf_links.csv"
-BASE_PATH = r"c:\Users\terre\Documents\Victor Dissertation Project - Gemini\pdf download 990"
 API_BASE_URL = "https://projects.propublica.org/nonprofits/api/v2/organizations"
 
-# Headers to mimic a browser
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-}
-
 def get_filings(ein):
     """Queries the ProPublica Nonprofits API for an organization's filings."""
     if not ein: return None
@@ -4,18 +4,15 @@ import time
 import os
 import sys
 
+from config import BASE_PATH, HEADERS
+import profiling
+
 # --- Constants ---
 INPUT_FILE = "unique_eins_corrected.csv"
 OUTPUT_FILE = "unique_eins_with_pdf_links_v2.csv"
-BASE_PATH = r"c:\Users\terre\Documents\Victor Dissertation Project - Gemini\pdf download 990"
 API_BASE_URL = "https://projects.propublica.org/nonprofits/api/v2/organizations"
 
-# Headers to mimic a browser
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-}
-
+@profiling.timed("get_filings")
 def get_filings(ein):
     """
     Queries the ProPublica Nonprofits API for an organization's filings.
@@ -32,7 +29,8 @@ def get_filings(ein):
             return None
             
         response.raise_for_status()
-        return response.json()
+        with profiling.timer("get_filings.json_decode"):
+            return response.json()
     except requests.exceptions.RequestException:
         return None
 
@@ -50,7 +48,7 @@ def main():
     print("Reading input CSV...")
     if not os.path.exists(input_path):
         print(f"Error: {input_path} not found.")
-        return
+        return 1
 
     all_rows = []
     unique_corrected_eins = set()
@@ -63,7 +61,7 @@ def main():
             input_fieldnames = reader.fieldnames
             if not input_fieldnames:
                 print("Error: Empty CSV or no headers found.")
-                return
+                return 1
             
             # Store all rows
             for row in reader:
@@ -73,7 +71,7 @@ def main():
                     unique_corrected_eins.add(cein)
     except Exception as e:
         print(f"Error reading CSV: {e}")
-        return
+        return 1
 
     print(f"Found {len(all_rows)} total rows.")
     print(f"Found {len(unique_corrected_eins)} unique Corrected EINs to process.")
@@ -158,11 +156,12 @@ def main():
                     matches_found += 1
                 
                 row["990_PDF_URL"] = pdf_link
-                writer.writerow(row)
+                with profiling.timer("match.csv_writerow"):
+                    writer.writerow(row)
                 
     except Exception as e:
         print(f"Error writing output CSV: {e}")
-        return
+        return 1
 
     # 4. Summary
     coverage = (matches_found / len(all_rows) * 100) if len(all_rows) > 0 else 0
@@ -175,4 +174,6 @@ def main():
     print("---------------------------------------------------------")
 
 if __name__ == "__main__":
-    main()
+    with profiling.stage("match"):
+        status = main()
+    sys.exit(status)
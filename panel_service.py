@@ -0,0 +1,262 @@
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from config import BASE_PATH
+import derived_metrics
+
+# --- Configuration ---
+INPUT_FILE = "unique_eins_with_pdf_links_v2.csv"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8990
+CACHE_SIZE = 1024
+
+ID_COLUMNS = ["university_folder", "IPEDS UnitID", "Corrected_EIN", "Institution Name", "Sector", "Year"]
+
+# Source File in the IPEDS list -> sector label
+SECTORS = {
+    "List of Open Colleges.xlsx": "Open",
+    "List of Closed Colleges.xlsx": "Closed",
+}
+# Some institutions appear in both lists; the closed list is the later,
+# more specific source, so it decides the sector.
+SECTOR_PRECEDENCE = ["Closed", "Open", "Unknown"]
+
+# Placeholder the IPEDS lists use when no UnitID was found
+MISSING_UNITID = "Not Found"
+
+def institution_folder(ein, name):
+    """
+    Rebuilds the `{ein}_{safe_name}` folder name used by
+    download_990_forms_v2, which is how extracted rows are keyed.
+    """
+    inst_name = str(name or "Unknown").replace(" ", "_").replace("/", "_")[:30]
+    safe_name = "".join([c for c in inst_name if c.isalnum() or c == '_'])
+    return f"{ein}_{safe_name}"
+
+class ResultCache:
+    """
+    Thread-safe LRU cache for query results (lists of flat record dicts).
+    Callers get their own copies of the records, so mutating a result
+    cannot corrupt later cache hits.
+    """
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return [dict(row) for row in self._data[key]]
+            self.misses += 1
+        # Compute outside the lock so slow queries don't block cache hits.
+        value = compute()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return [dict(row) for row in value]
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+class PanelStore:
+    """
+    Read-only, in-memory view of the IPEDS x 990 panel: one row per
+    institution download folder and Year, joined to the derived-metrics
+    table (every extracted financial field plus the derived ratios). Rows
+    are indexed by institution (IPEDS UnitID and folder name) and by year,
+    and sector/year aggregates are computed once at load time.
+    """
+    def __init__(self, panel, cache_size=CACHE_SIZE):
+        self.panel = panel.sort_values(["university_folder", "Year"]).reset_index(drop=True)
+        self.fields = [c for c in self.panel.columns if c not in ID_COLUMNS]
+        self.by_institution = self._build_index("university_folder")
+        # A UnitID can cover more than one folder (e.g. a renamed college).
+        for unitid, idx in self._build_index("IPEDS UnitID").items():
+            self.by_institution[unitid] = idx
+        self.by_year = self._build_index("Year")
+        self.sector_aggregates = (
+            self.panel.groupby(["Sector", "Year"])[self.fields]
+            .median()
+            .join(self.panel.groupby(["Sector", "Year"]).size().rename("Institutions"))
+            .reset_index()
+        )
+        self.cache = ResultCache(cache_size)
+
+    @classmethod
+    def load(cls, base_path=BASE_PATH, cache_size=CACHE_SIZE):
+        """
+        Builds the store from the IPEDS link file and derived_metrics.csv.
+        """
+        ipeds = pd.read_csv(os.path.join(base_path, INPUT_FILE), dtype=str, encoding="utf-8-sig")
+        ipeds["Year"] = pd.to_numeric(ipeds["Year"], errors="coerce")
+        ipeds = ipeds[ipeds["Year"].notna()].copy()
+        ipeds["Year"] = ipeds["Year"].astype(int)
+        ipeds["IPEDS UnitID"] = ipeds["IPEDS UnitID"].where(ipeds["IPEDS UnitID"] != MISSING_UNITID)
+        ipeds["university_folder"] = [
+            institution_folder(ein or orig, name)
+            for ein, orig, name in zip(ipeds["Corrected_EIN"], ipeds["EIN"], ipeds["Institution Name"])
+        ]
+
+        # One sector per institution: an institution listed as closed is
+        # Closed in every year, wherever its rows sit in the CSV.
+        sector = pd.Categorical(
+            ipeds["Source File"].map(SECTORS).fillna("Unknown"), categories=SECTOR_PRECEDENCE, ordered=True
+        )
+        ipeds["Sector"] = pd.Series(sector, index=ipeds.index).groupby(ipeds["university_folder"]).transform("min").astype(str)
+
+        # The folder is what extracted rows are keyed on, so only rows for
+        # the same folder and year (an institution listed twice) collapse.
+        ipeds = ipeds.drop_duplicates(["university_folder", "Year"])
+
+        metrics = derived_metrics.load_metrics(os.path.join(base_path, derived_metrics.OUTPUT_FILE))
+        panel = ipeds[ID_COLUMNS].merge(metrics, on=["university_folder", "Year"], how="left")
+        return cls(panel, cache_size=cache_size)
+
+    def _build_index(self, column):
+        # groupby drops missing keys, so rows without a UnitID are only
+        # reachable through their folder name.
+        return {key: np.asarray(idx) for key, idx in self.panel.groupby(column).indices.items()}
+
+    def _records(self, frame, fields):
+        columns = [c for c in ID_COLUMNS if c in frame.columns] + self._select_fields(fields)
+        frame = frame[columns].astype(object).where(frame[columns].notna(), None)
+        return frame.to_dict(orient="records")
+
+    def _select_fields(self, fields):
+        if not fields:
+            return list(self.fields)
+        unknown = [f for f in fields if f not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        return list(fields)
+
+    def institution_series(self, institution, fields=None):
+        """
+        Returns the yearly rows for one institution, given either its IPEDS
+        UnitID or its download folder name (for institutions without one).
+        """
+        institution = str(institution)
+        key = ("institution", institution, tuple(fields or ()))
+        def compute():
+            idx = self.by_institution.get(institution)
+            if idx is None:
+                return []
+            return self._records(self.panel.iloc[idx], fields)
+        return self.cache.get_or_compute(key, compute)
+
+    def cross_section(self, year, fields=None, sector=None):
+        """
+        Returns every institution's row for one year, optionally limited to
+        a sector ('Open' or 'Closed').
+        """
+        year = int(year)
+        key = ("year", year, tuple(fields or ()), sector)
+        def compute():
+            idx = self.by_year.get(year)
+            if idx is None:
+                return []
+            frame = self.panel.iloc[idx]
+            if sector:
+                frame = frame[frame["Sector"] == sector]
+            return self._records(frame, fields)
+        return self.cache.get_or_compute(key, compute)
+
+    def sectors(self, sector=None, fields=None):
+        """
+        Returns the precomputed per-sector, per-year medians.
+        """
+        key = ("sectors", sector, tuple(fields or ()))
+        def compute():
+            frame = self.sector_aggregates
+            if sector:
+                frame = frame[frame["Sector"] == sector]
+            columns = ["Sector", "Year", "Institutions"] + self._select_fields(fields)
+            return frame[columns].astype(object).where(frame[columns].notna(), None).to_dict(orient="records")
+        return self.cache.get_or_compute(key, compute)
+
+def make_handler(store):
+    """
+    Builds a request handler serving `store` as read-only JSON:
+
+        GET /institution/<unitid or folder>[?fields=a,b]
+        GET /year/<year>[?sector=Open&fields=a,b]
+        GET /sectors[?sector=Closed&fields=a,b]
+        GET /stats
+    """
+    class PanelHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            fields = [f for f in params.get("fields", [""])[0].split(",") if f] or None
+            sector = params.get("sector", [None])[0]
+            parts = [p for p in url.path.split("/") if p]
+
+            try:
+                if len(parts) == 2 and parts[0] == "institution":
+                    result = store.institution_series(parts[1], fields)
+                elif len(parts) == 2 and parts[0] == "year":
+                    result = store.cross_section(parts[1], fields, sector)
+                elif parts == ["sectors"]:
+                    result = store.sectors(sector, fields)
+                elif parts == ["stats"]:
+                    result = {"rows": len(store.panel), "cache": store.cache.stats()}
+                else:
+                    return self._send(404, {"error": "not found"})
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            self._send(200, result)
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Keep the console quiet under dashboard polling.
+            pass
+
+    return PanelHandler
+
+def main(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    print("---------------------------------------------------------")
+    print("Starting Panel Query Service")
+
+    metrics_path = os.path.join(BASE_PATH, derived_metrics.OUTPUT_FILE)
+    if not os.path.exists(metrics_path):
+        print(f"Error: {metrics_path} not found. Run derived_metrics.py first.")
+        return 1
+
+    store = PanelStore.load()
+    print(f"Loaded {len(store.panel)} rows for {store.panel['university_folder'].nunique()} institutions.")
+
+    server = ThreadingHTTPServer((host, port), make_handler(store))
+    print(f"Serving on http://{host}:{port} (Ctrl+C to stop)")
+    print("---------------------------------------------------------")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    sys.exit(main())
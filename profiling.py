@@ -0,0 +1,233 @@
+"""
+Opt-in profiling hooks for the pipeline scripts.
+
+Nothing is recorded unless profiling is switched on, either with
+`ipeds990 --profile [cprofile|sample] <command>` or by setting
+IPEDS990_PROFILE=cprofile (or =sample) before running a script.
+
+  * `timed(name)` / `timer(name)` collect call counts and wall time for hot
+    functions such as get_filings or download_file.
+  * `stage(name)` wraps a whole command. In `cprofile` mode it writes a
+    `.prof` file (pstats format, readable by snakeviz/flameprof); in
+    `sample` mode a background thread samples all thread stacks and writes a
+    `.folded` file for flamegraph.pl or speedscope.
+
+When a stage ends, a ranked top-N report of the timers and the hottest
+functions is printed and saved next to the profile output.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from config import BASE_PATH, get_setting
+
+MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL = 0.005
+TOP_N = 20
+
+_mode = get_setting("profile", "mode", "IPEDS990_PROFILE", "").strip().lower()
+if _mode in ("1", "true", "yes", "on"):
+    _mode = "cprofile"
+_output_dir = get_setting("profile", "output_dir", "IPEDS990_PROFILE_DIR", os.path.join(BASE_PATH, "profiles"))
+
+# name -> [calls, total seconds, max seconds]
+_timings = {}
+_timings_lock = threading.Lock()
+
+def is_enabled():
+    return _mode in MODES
+
+def _record(name, elapsed):
+    with _timings_lock:
+        entry = _timings.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] = max(entry[2], elapsed)
+
+@contextmanager
+def timer(name):
+    """
+    Times the enclosed block under `name` when profiling is enabled.
+    """
+    if not is_enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start)
+
+def timed(name=None):
+    """
+    Decorator form of `timer`; defaults to the function's qualified name.
+    """
+    def decorator(func):
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not is_enabled():
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+class _StackSampler(threading.Thread):
+    """
+    Periodically records the Python stack of every other thread as a
+    collapsed ("a;b;c") stack string.
+    """
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+class _ThreadProfilers:
+    """
+    Gives every thread started during a cprofile stage its own
+    cProfile.Profile, so work done in thread pools (such as the download
+    workers) appears in the stage profile. Before Python 3.12 a profiler only
+    sees the thread that enabled it.
+    """
+    def __init__(self, profile_class):
+        self.profile_class = profile_class
+        self.profilers = []
+        self._lock = threading.Lock()
+
+    def _bootstrap(self, frame, event, arg):
+        # threading installs this hook in each new thread; the profiler
+        # enabled here replaces it for the rest of that thread's life.
+        profiler = self.profile_class()
+        with self._lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+
+    def start(self):
+        threading.setprofile(self._bootstrap)
+
+    def stop(self):
+        threading.setprofile(None)
+        with self._lock:
+            return list(self.profilers)
+
+def _timings_report(top_n):
+    with _timings_lock:
+        rows = sorted(_timings.items(), key=lambda item: item[1][1], reverse=True)[:top_n]
+    lines = [f"{'total s':>10} {'calls':>8} {'mean ms':>10} {'max ms':>10}  timer"]
+    for name, (calls, total, longest) in rows:
+        lines.append(f"{total:10.3f} {calls:8d} {total / calls * 1000:10.2f} {longest * 1000:10.2f}  {name}")
+    return lines
+
+def _sample_report(samples, top_n):
+    # Rank functions by how many samples they were on top of the stack
+    # (self time) and anywhere on the stack (inclusive time).
+    self_counts = Counter()
+    inclusive_counts = Counter()
+    for stack, count in samples.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            inclusive_counts[frame] += count
+    total = sum(samples.values()) or 1
+    lines = [f"{'self %':>7} {'incl %':>7}  function"]
+    for func, count in self_counts.most_common(top_n):
+        lines.append(f"{count / total * 100:7.1f} {inclusive_counts[func] / total * 100:7.1f}  {func}")
+    return lines
+
+@contextmanager
+def stage(name, top_n=TOP_N):
+    """
+    Profiles the enclosed block as one pipeline stage when profiling is
+    enabled, then writes the profile and a ranked top-N report.
+    """
+    if not is_enabled():
+        yield
+        return
+
+    os.makedirs(_output_dir, exist_ok=True)
+    prefix = os.path.join(_output_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    with _timings_lock:
+        _timings.clear()
+
+    profiler = None
+    thread_profilers = None
+    sampler = None
+    if _mode == "cprofile":
+        import cProfile
+        if sys.version_info < (3, 12):
+            thread_profilers = _ThreadProfilers(cProfile.Profile)
+            thread_profilers.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        sampler = _StackSampler()
+        sampler.start()
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        # Stop profiling before anything else so the report's own work
+        # (including importing pstats) stays out of the profile.
+        if profiler is not None:
+            profiler.disable()
+        worker_profilers = thread_profilers.stop() if thread_profilers else []
+        elapsed = time.perf_counter() - start
+        lines = [f"Stage '{name}' took {elapsed:.2f} s ({_mode})", "", "Timers:"]
+        lines += _timings_report(top_n)
+        lines += ["", f"Top {top_n} functions:"]
+
+        if profiler is not None:
+            import io
+            import pstats
+            stream = io.StringIO()
+            stats = pstats.Stats(profiler, stream=stream)
+            for worker_profiler in worker_profilers:
+                stats.add(worker_profiler)
+            stats.dump_stats(prefix + ".prof")
+            stats.sort_stats("cumulative").print_stats(top_n)
+            lines += stream.getvalue().strip().splitlines()
+            output_file = prefix + ".prof"
+        else:
+            sampler.stop()
+            with open(prefix + ".folded", 'w', encoding='utf-8') as f:
+                for stack, count in sampler.samples.items():
+                    f.write(f"{stack} {count}\n")
+            lines += _sample_report(sampler.samples, top_n)
+            output_file = prefix + ".folded"
+
+        report = "\n".join(lines)
+        with open(prefix + "-top.txt", 'w', encoding='utf-8') as f:
+            f.write(report + "\n")
+
+        print("\n---------------------------------------------------------")
+        print(report)
+        print(f"\nProfile saved to: {output_file}")
+        print("---------------------------------------------------------")